@@ -167,6 +167,17 @@ class LatexCode(object):
         from .MacroUse import SearchUseOfMacro
         return SearchUseOfMacro(self, name, number_of_arguments, give_configuration, fast=fast)
 
+    def search_use_of_macros(self, names, fast=False):
+        r"""
+        Return a dictionary name -> list of Occurrence for each of the given macros,
+        which are supposed to have exactly one argument.
+        codeLaTeX.search_use_of_macros(["\label", "\ref"], fast=True)
+
+        With fast=True, the code is scanned only once for all the names.
+        """
+        from .MacroUse import SearchUseOfMacros
+        return SearchUseOfMacros(self, names, fast=fast)
+
     def analyse_use_of_macro(self, name, number_of_arguments=None):
         """
         Provide a list of analyse of the occurrences of a macro.
@@ -356,6 +367,25 @@ class LatexCode(object):
         A = LatexCode(new_text, oldLaTeX=self)
         return A
 
+    @inherit_properties
+    def replace_spans(self, spans, textB):
+        """
+        Replace by textB each of the parts of the code given by 'spans',
+        a list of non-overlapping (start, end) positions in self.text_brut.
+
+        The new text is built in one pass.
+        """
+        textB = ensure_unicode(textB)
+        pieces = []
+        turtle = 0
+        for start, end in sorted(spans):
+            pieces.append(self.text_brut[turtle:start])
+            pieces.append(textB)
+            turtle = end
+        pieces.append(self.text_brut[turtle:])
+        A = LatexCode("".join(pieces), oldLaTeX=self)
+        return A
+
     def splitlines(self):
         textA = self.text_brut
         return textA.splitlines()
@@ -238,3 +238,30 @@ def SearchUseOfMacro(code,macro_name,number_of_arguments=None,give_configuration
         return use,configuration
     else :
         return use
+
+def SearchUseOfMacros(code,macro_names,fast=False):
+    r"""
+    Return a dictionary macro_name -> list of Occurrence, for each name in <macro_names>.
+    The names have to contain the initial \ as in SearchUseOfMacro.
+
+    Only macros with exactly one argument are supported.
+
+    If fast is true, the text is scanned only once for all the macros, with the same assumptions
+    as the fast version of SearchUseOfMacro. Otherwise SearchUseOfMacro is called for each name.
+    """
+    if not fast :
+        return { name:SearchUseOfMacro(code,name,1) for name in macro_names }
+
+    use = { name:[] for name in macro_names }
+    s = code.text_brut
+    alternatives = "|".join(re.escape(name) for name in macro_names)
+    results=re.finditer("("+alternatives+"){",s)
+    for res in results :
+        macro_name = res.group(1)
+        start = res.start()
+        end=s.find("}",start)
+        as_written = s[start:end]
+        arguments=[s[start+len(macro_name):end]]
+        occurrence=Occurrence(macro_name,arguments,as_written,position=start)
+        use[macro_name].append(occurrence)
+    return use
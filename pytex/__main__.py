@@ -21,12 +21,15 @@
 
 import os
 import sys
-import subprocess
+import atexit
+import random
+import shutil
+import string
 import importlib
 from pathlib import Path
+from collections import defaultdict
 
 from .utilities import logging
-from .future_verif import get_future_warning
 from .all import FileToText
 from .all import FileToLatexCode
 from .all import FileToLogCode
@@ -74,15 +77,17 @@ Options :
         This does not empties the file if it exists,
         but creates it if it does not exist.
 
+    --hardlink-outputs
+        The final pdf and synctex files are hard links to the
+        ones produced by LaTeX instead of copies (fall back to
+        a copy when the link is not possible).
+        The final pdf then changes during the next compilation.
+
 """
 
 
 #       La couleur dans laquelle sont écrits les textes.
 ColTexte = 33
-# C'est peut-être encore un peu tricher
-utilisateur = subprocess.getoutput("whoami")
-HOME = subprocess.getoutput("echo $HOME")
-PYTHONPATH = subprocess.getoutput("echo $PYTHONPATH")
 
 
 class SummaryOutput(object):
@@ -94,9 +99,7 @@ class SummaryOutput(object):
         self.out = out
 
     def __call__(self, *args):
-        text = ""
-        for a in args:
-            text = text+str(a)+" "
+        text = "".join(str(a)+" " for a in args)
         self.out.write(text+"\n")
 
 
@@ -116,14 +119,22 @@ class FileOutput(object):
 
     def __init__(self, filename):
         self.filename = filename
-        if not os.path.isfile(self.filename):
-            with open(self.filename, 'w') as f:
-                f.write("Here is the log file")
+        # The file is opened once (line-buffered) and kept open
+        # until the end of the program.
+        self._fh = open(self.filename, 'a', buffering=1)
+        atexit.register(self.close)
+        # In append mode we are at the end of the file: position 0
+        # means that the file was just created.
+        if self._fh.tell() == 0:
+            self._fh.write("Here is the log file")
 
     def write(self, text):
         sys.stdout.write(text)
-        with open(self.filename, 'a') as f:
-            f.write(text)
+        self._fh.write(text)
+
+    def close(self):
+        if not self._fh.closed:
+            self._fh.close()
 
 
 def arg_to_output(arg):
@@ -136,15 +147,20 @@ def arg_to_output(arg):
     return SummaryOutput(FileOutput(filename))
 
 
+# Escape sequences for the colors used by `ecrire`.
+_COL = {c: f"\033[0;{c};33m" for c in range(30, 48)}
+
+
 def ecrire(texte, couleur, output=None):
     # Noir 30 40, Rouge 31 41, Vert 32 42, Jaune 33 43, Bleu 34 44,
     # Magenta 35 45, Cyan 36 46, Blanc 37 47,
     # la police: 0->rien,  1->gras, 4->souligné, 5->clignotant, 7->inversée
-    string = "\033[0;"+str(couleur)+";33m"+texte+"\033[0;47;33m"
+    prefix = _COL.get(couleur) or f"\033[0;{couleur};33m"
+    message = f"{prefix}{texte}\033[0;47;33m"
     if output is None:
-        print(string)
+        sys.stdout.write(message+"\n")
     else:
-        output(string)
+        output(message)
 
 
 class Compil(object):
@@ -192,12 +208,7 @@ def randombase(n=6):
     """
     return a random string of (by default) 6 characters.
     """
-    import random
-    import string
-    rb = ""
-    for i in range(0, n):
-        rb = rb+random.choice(string.ascii_letters)
-    return rb
+    return "".join(random.choices(string.ascii_letters, k=n))
 
 
 class Options(object):
@@ -220,9 +231,11 @@ class Options(object):
     def __init__(self, arguments):
         self.arguments = arguments
 
-        self.pwd = subprocess.getoutput("pwd")  # .decode("utf8")
+        self.pwd = os.getcwd()
         self._pytex_file = None
         self._intermediate_code = None
+        self._rough_code = None
+        self._rough_code_fast = None
         # Cette liste sont les fichiers .tex à accepter par input
         self.ok_filenames_list = []
         # Cette liste sont les fichiers .tex qui sont à refuser par input
@@ -232,9 +245,11 @@ class Options(object):
         self.Compil.verif = False
         self.plugin_list = []
         self.before_pytex_plugin_list = []
+        self._plugins_by_hook = defaultdict(list)
         self.nombre_prob = 0
         self.new_output_filename = None  # see copy_final_file
         self.new_output_filenames = None
+        self.hardlink_outputs = False
         self.output = SummaryOutput(sys.stdout)
         for arg in self.arguments:
             if arg[0] != "-":
@@ -251,21 +266,21 @@ class Options(object):
                 self.Sortie.nocompilation = True
             if "--output=" in arg:
                 self.output = arg_to_output(arg)
+            if arg == "--hardlink-outputs":
+                self.hardlink_outputs = True
 
         self.listeFichPris = []
-        self.pytex_filename = self.pwd+"/"+"Inter_"+self.prefix+"-" + \
-            os.path.basename(self.original_file).replace(".tex", "_pytex.tex")
-        self.source_filename = self.pwd+"/"+self.prefix + \
-            "-source-"+os.path.basename(self.original_file)
-
+        original = Path(self.original_file)
+        pwd = Path(self.pwd)
         if self.Compil.tout == 1:
-            self.source_filename = self.pwd+"/all-" + \
-                os.path.basename(self.original_file)
-            self.pytex_filename = self.pwd+"/all-" + \
-                os.path.basename(self.original_file).replace(
-                    ".tex", "_pytex.tex")
-        self.log_filename = self.pytex_filename.replace(
-            "_pytex.tex", "_pytex.log")
+            pytex_stem = f"all-{original.stem}_pytex"
+            self.source_filename = str(pwd / f"all-{original.name}")
+        else:
+            pytex_stem = f"Inter_{self.prefix}-{original.stem}_pytex"
+            self.source_filename = str(
+                pwd / f"{self.prefix}-source-{original.name}")
+        self.pytex_filename = str(pwd / f"{pytex_stem}.tex")
+        self.log_filename = str(pwd / f"{pytex_stem}.log")
 
         self.pytex_grep = PytexGrep(Path.cwd())
 
@@ -280,12 +295,22 @@ class Options(object):
         return True
 
     def rough_code(self, options, fast=False):
+        """
+        Return the rough code (see LatexCode.rough_source).
+
+        The result is memoized: '--rough-source' and '--verif'
+        use the same one.
+        """
+        if self._rough_code is not None and self._rough_code_fast == fast:
+            return self._rough_code
         codeLaTeX = FileToLatexCode(options.pytex_file())
         print("Creating rough code")
         rough_code = codeLaTeX.rough_source(
             options.source_filename,
             options.bibliographie(),
             options.index(), fast=fast)
+        self._rough_code = rough_code
+        self._rough_code_fast = fast
         return rough_code
 
     def future_reference_verification(self, options, fast=True):
@@ -303,41 +328,29 @@ class Options(object):
         \label{foo\Macro{bar}boor}
         """
 
+        # Only needed with '--verif'; importing it pulls 'pygrep'.
+        from .future_verif import get_future_warning
+
         # rough_code with fast=True is buggy.
         rough_code = self.rough_code(options, fast=False)
 
-        print("Analysing the document for label")
-        labels = rough_code.search_use_of_macro("\label", 1, fast=fast)
-
-        print("Analysing the document for ref")
-        ref = rough_code.search_use_of_macro(r"\ref", 1, fast=fast)
+        print("Analysing the document for label, ref and eqref")
+        uses = rough_code.search_use_of_macros(
+            [r"\label", r"\ref", r"\eqref"], fast=fast)
+        labels = uses[r"\label"]
+        ref = uses[r"\ref"]
+        eqref = uses[r"\eqref"]
 
-        print("Analysing the document for eqref")
-        eqref = rough_code.search_use_of_macro("\eqref", 1, fast=fast)
-
-        ref_dict = {}
         label_dict = {}
 
         print("Working on future references ...")
 
-        for occ in labels:
-            label = occ.arguments[0]
-            ref_dict[label] = []
-
         references = ref[:]
         references.extend(eqref)
 
-        for occ in references:
-            label = occ.arguments[0]
-            ref_dict[label] = []
-
-        for occ in references:
-            label = occ.arguments[0]
-            ref_dict[label].append(occ)
-
         for occ in labels:
             label = occ.arguments[0]
-            if label in label_dict.keys():
+            if label in label_dict:
                 output("The label <{0}> is used multiple times".format(label))
                 output("Here is the last time I see that")
                 output(occ.as_written)
@@ -360,23 +373,29 @@ class Options(object):
         # is the corresponding \label. The 'concerned_files' list keeps is list
         # of the files that are concerned by a future references.
         future_warnings = []
-        for tested_label in label_dict.keys():
-            for ref in ref_dict[tested_label]:
-                warning = get_future_warning(rough_code, label_dict,
-                                             tested_label, ref,
-                                             self.myRequest)
-                if warning:
-                    future_warnings.append(warning)
+        for ref in references:
+            tested_label = ref.arguments[0]
+            if tested_label not in label_dict:
+                continue
+            warning = get_future_warning(rough_code, label_dict,
+                                         tested_label, ref,
+                                         self.myRequest)
+            if warning:
+                future_warnings.append(warning)
 
         concerned_files = []
         total_futur = 0
+        # The warnings are collected and written at once.
+        messages = []
         for warning in future_warnings:
             # The function `has_to_be_printed` is defined in
             # the file `lst_foo.py`.
             if self.myRequest.has_to_be_printed(warning):
-                warning.output()
+                warning.output(messages.append)
                 total_futur += 1
             concerned_files.extend(warning.concerned_files)
+        if messages:
+            sys.stdout.write("\n".join(messages)+"\n")
         print(f"Number of future references: {total_futur}")
 
     def make_final_copy(self, pdf_output, new_filename):
@@ -389,18 +408,45 @@ class Options(object):
         The main point of this function is not the copy itself (shutil.copy2), but the fact
         to manage the ".synctex.gz" files in the same time.
         """
-        import shutil
         logging("Copy : "+pdf_output+" --> "+new_filename)
-        shutil.copy2(pdf_output, new_filename)
+        self.final_copy(pdf_output, new_filename)
 
         # One has to copy the file foo.synctex.gz to  0-foo.synctex.gz
         output_synctex = pdf_output.replace(".pdf", ".")+"synctex.gz"
         new_output_synctex = new_filename.replace(".pdf", ".synctex.gz")
-        if not os.path.exists(output_synctex):
-            raise NameError(
-                "This is a problem about synctex. {0} do not exist".format(output_synctex))
+        try:
+            self.final_copy(output_synctex, new_output_synctex)
+        except FileNotFoundError as err:
             # TODO : this message produces an unicode error when there are accents in the path name.
-        shutil.copy2(output_synctex, new_output_synctex)
+            raise NameError(
+                "This is a problem about synctex. {0} do not exist".format(output_synctex)) from err
+
+    def final_copy(self, source, destination):
+        """
+        Copy 'source' to 'destination'.
+
+        With '--hardlink-outputs', first try to make 'destination' a
+        hard link to 'source'. The link is created under a temporary
+        name and then moved, so that 'destination' is replaced at once.
+        """
+        if self.hardlink_outputs:
+            tmp_destination = destination+".pytex-link"
+            try:
+                # Renaming a link onto the same file does nothing.
+                if os.path.exists(destination) and \
+                        os.path.samefile(source, destination):
+                    return
+                if os.path.lexists(tmp_destination):
+                    os.remove(tmp_destination)
+                os.link(source, tmp_destination)
+                os.replace(tmp_destination, destination)
+                return
+            except FileNotFoundError:
+                raise
+            except OSError:
+                # Cross-device link, unsupported filesystem, ...
+                pass
+        shutil.copy2(source, destination)
 
     def copy_final_file(self):
         """
@@ -471,6 +517,7 @@ class Options(object):
             # position ooMEVCoo
             for plugin in [x for x in self.myRequest.plugin_list if x.hook_name == "options"]:
                 plugin(self)
+            self.partition_plugins()
 
             #self.original_file = manip.Fichier(self.myRequest.original_filename)
             self.original_file = self.myRequest.original_filename
@@ -494,14 +541,23 @@ class Options(object):
             self._intermediate_code = ProduceIntermediateCode(self)
         return self._intermediate_code
 
+    def partition_plugins(self):
+        """
+        Sort the plugins of `myRequest` by hook name, so that
+        `apply_plugin` does not scan the whole list at each hook.
+
+        Has to be called again when plugins are added to `myRequest`.
+        """
+        self._plugins_by_hook = defaultdict(list)
+        for plugin in self.myRequest.plugin_list:
+            self._plugins_by_hook[plugin.hook_name].append(plugin)
+
     def apply_plugin(self, A, hook_name):
         """
         The plugin on the options object itself are called
         at the position ooMEVCoo
         """
-        for plugin in self.myRequest.plugin_list:
-            if plugin.hook_name != hook_name:
-                continue
+        for plugin in self._plugins_by_hook.get(hook_name, ()):
             print("Applying the plugin", plugin.fun, plugin.hook_name)
             if hook_name in ["before_compilation",
                              "after_compilation"]:
@@ -539,6 +595,8 @@ class Options(object):
 
         A.save(self.pytex_filename)
         self._pytex_file = A.filename
+        # The rough code is computed from the pytex file.
+        self._rough_code = None
 
         return self.pytex_file()
 
@@ -569,6 +627,7 @@ def ProduceIntermediateCode(options):
     if options.Compil.tout == 0:
         list_input = codeLaTeX.search_use_of_macro("\input", 1)
         begin_document = codeLaTeX.find("\\begin{document}")
+        rejected_spans = []
         for occurrence in list_input:
             A = occurrence.analyse()
             # If an "\input" is before "\begin{document}", we keep it.
@@ -577,9 +636,9 @@ def ProduceIntermediateCode(options):
             # inside \newcommand for example.
             if A.position > begin_document:
                 if not options.accept_input(A.filename):
-                    codeLaTeX = codeLaTeX.replace(occurrence.as_written, "%")
-                else:
-                    pass
+                    rejected_spans.append(
+                        (A.position, A.position+len(A.as_written)))
+        codeLaTeX = codeLaTeX.replace_spans(rejected_spans, "%")
     return codeLaTeX
 
 
@@ -611,6 +670,8 @@ def RunMe(options):
         options.myRequest.run_prerequistes(options)
     except AttributeError:
         pass
+    # The prerequisites may have added plugins.
+    options.partition_plugins()
     if options.Sortie.rough_source:
         options.create_rough_source(options.source_filename)
 
@@ -19,7 +19,9 @@
 # email: laurent@claessens-donadello.eu
 
 import os.path
+import stat
 import codecs
+import functools
 from .log_code import LogCode
 from .LatexCode import LatexCode
 
@@ -30,17 +32,27 @@ def FileToLatexCode(name,fast=False,keep_comments=False):
     A.included_file_list=[name]
     return A
 
+@functools.lru_cache(maxsize=256)
+def _file_to_text_cached(name, mtime_ns, size):
+    """
+    Read the file. The arguments 'mtime_ns' and 'size' are only
+    used as cache key: a file that did not change is not read twice.
+    """
+    with codecs.open(name,"r",encoding="utf8") as f:
+        return f.read()
+
 def FileToText(name):
     """ return the content of a file as string
 
     If the file do not exist, return empty string.
     """
-    l=[]
-    if not os.path.isfile(name):
+    try:
+        st = os.stat(name)
+    except OSError:
+        return ""
+    if not stat.S_ISREG(st.st_mode):
         return ""
-    for line in codecs.open(name,"r",encoding="utf8"):
-        l.append(line)
-    return "".join(l)
+    return _file_to_text_cached(name, st.st_mtime_ns, st.st_size)
 
 def string_to_latex_code(s):
     return LatexCode(s)
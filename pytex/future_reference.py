@@ -20,24 +20,24 @@ class FutureReference:
         if self.hexdigest in myRequest.ok_hash:
             raise ValueError(f"__init__ : {self.hexdigest}")
 
-    def output(self):
-        """Print self."""
-        print("")
-        print("----------------------------")
-        print("")
-        print(f"{self.ref_line.filename} : {self.ref_line.linenumber}")
+    def output(self, emit=print):
+        """Print self, or give the lines to `emit`."""
+        emit("")
+        emit("----------------------------")
+        emit("")
+        emit(f"{self.ref_line.filename} : {self.ref_line.linenumber}")
         colored_label = f"\033[0;33;33m{self.tested_label}\033[0;47;33m"
         str_line = self.ref_line.string
-        print(str_line.replace(self.tested_label, colored_label))
+        emit(str_line.replace(self.tested_label, colored_label))
 
         # Not test if ref_line.filename is already in concerned_files.
         # Thus the myRequest.append lines will appear
         # by pairs of linked files.
 
-        print(f"{self.label_line.filename}: {self.label_line.linenumber}")
+        emit(f"{self.label_line.filename}: {self.label_line.linenumber}")
 
         str_line = self.label_line.string
         colored_label = f"\033[0;33;33m{self.tested_label}\033[0;47;33m"
-        print(str_line.replace(self.tested_label, colored_label))
+        emit(str_line.replace(self.tested_label, colored_label))
 
-        print("hash: ", self.hexdigest)
+        emit(f"hash:  {self.hexdigest}")